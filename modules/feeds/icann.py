@@ -6,15 +6,94 @@ import asyncio
 import json
 import zlib
 from collections.abc import AsyncIterator
+from pathlib import PurePosixPath
+from urllib.parse import urlparse
 
+import numpy as np
+import ray
 from dotenv import dotenv_values
-from modules.utils.feeds import generate_hostname_expressions
-from modules.utils.http_requests import get_async, get_async_stream, post_async
+from modules.utils.feeds import (
+    generate_hostname_expressions,
+    hostname_expression_batch_size,
+)
+from modules.utils.http_requests import (
+    backoff_delay_async,
+    get_async,
+    get_async_iter,
+    post_async,
+)
 from modules.utils.log import init_logger
 
+try:
+    # SIMD-accelerated inflate from Intel ISA-L;
+    # drop-in replacement for stdlib zlib decompression
+    from isal import isal_zlib as zlib_engine  # type: ignore
+except ImportError:
+    zlib_engine = zlib  # type: ignore
+
+try:
+    # C-level JSON codec; orjson.dumps returns bytes directly,
+    # skipping the separate .encode() step
+    import orjson
+
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:
+
+    def _json_dumps(obj) -> bytes:  # type: ignore
+        return json.dumps(obj).encode()
+
+    _json_loads = json.loads  # type: ignore
+
 logger = init_logger()
 
 
+def _owner_name_spans(arena: bytes, cut: int) -> tuple[np.ndarray, np.ndarray]:
+    """Locate the owner name of every line in `arena[:cut]` with
+    vectorized numpy scans, exploiting the rigid zone file schema
+    (`<owner> <ttl> <class> <type> <rdata>`): the owner name is
+    always the first token of its line, terminated by whitespace.
+
+    Args:
+        arena (bytes): Decompressed zone file chunk
+        cut (int): Scan up to this offset; `arena[:cut]` always
+        ends with a newline
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (Start offsets, End offsets)
+        of each line's owner name within `arena`. Lines starting
+        with whitespace (i.e. with an empty owner name) are omitted
+    """
+    data = np.frombuffer(arena, dtype=np.uint8, count=cut)
+    # Token delimiters: space, horizontal tab, CR, LF
+    delimiter_positions = np.flatnonzero((data == 0x20) | (data == 0x09) | (data == 0x0D) | (data == 0x0A))
+    newline_positions = delimiter_positions[data[delimiter_positions] == 0x0A]
+    line_starts = np.concatenate(([0], newline_positions[:-1] + 1))
+    # The first delimiter at or after each line start terminates that
+    # line's owner name; `arena[:cut]` ends with a newline, so a
+    # terminating delimiter always exists
+    owner_ends = delimiter_positions[np.searchsorted(delimiter_positions, line_starts)]
+    keep = owner_ends > line_starts
+    return line_starts[keep], owner_ends[keep]
+
+
+@ray.remote
+def _expand_hostnames(raw_urls: list[str]) -> set[str]:
+    """Generate Safe Browsing API-compliant hostname expressions
+    for `raw_urls` on a Ray worker process, off the asyncio loop
+    that drives the zone file downloads.
+
+    Args:
+        raw_urls (list[str]): URLs, without prefixes
+        (e.g. http:// https:// etc.)
+
+    Returns:
+        set[str]: Safe Browsing API-compliant
+        hostname expressions for each url in `raw_urls`
+    """
+    return generate_hostname_expressions(raw_urls)
+
+
 async def _authenticate(username: str, password: str) -> str:
     """Make a POST request for an Access Token from ICANN CZDS. The
     Access Token expires in 24 hours upon receipt.
@@ -32,14 +111,14 @@ async def _authenticate(username: str, password: str) -> str:
     }
     credential = {"username": username, "password": password}
     authentication_url = "https://account-api.icann.org/api/authenticate"
-    authentication_payload = json.dumps(credential).encode()
+    authentication_payload = _json_dumps(credential)
 
     resp = await post_async(
         [authentication_url],
         [authentication_payload],
         headers=authentication_headers,
     )
-    body = json.loads(resp[0][1])
+    body = _json_loads(resp[0][1])
 
     if "accessToken" not in body:
         logger.error("Failed to authenticate ICANN user")
@@ -71,13 +150,31 @@ async def _get_approved_endpoints(access_token: str) -> list[str]:
         )
     )[links_url]
 
-    body = json.loads(resp)
+    body = _json_loads(resp)
     if not isinstance(body, list):
         logger.warning("No user-accessible zone files found.")
         return []
     return body
 
 
+async def _bootstrap(username: str, password: str) -> tuple[str, list[str]]:
+    """Authenticate with ICANN CZDS, then download the list
+    of zone file endpoints approved for this user, all within
+    a single event loop run.
+
+    Args:
+        username (str): ICANN CZDS username
+        password (str): ICANN CZDS password
+
+    Returns:
+        tuple[str, list[str]]: (ICANN CZDS Access Token,
+        List of zone file endpoints)
+    """
+    access_token = await _authenticate(username, password)
+    endpoints = await _get_approved_endpoints(access_token)
+    return access_token, endpoints
+
+
 async def _get_icann_domains(endpoint: str, access_token: str) -> AsyncIterator[set[str]]:
     """Download domains from ICANN zone file endpoint
     and yield all listed URLs in batches.
@@ -91,27 +188,68 @@ async def _get_icann_domains(endpoint: str, access_token: str) -> AsyncIterator[
 
     """
 
-    url_generator = extract_zonefile_urls(
-        endpoint,
-        headers={
-            "Content-Type": "application/json",
-            "Connection": "keep-alive",
-            "Cache-Control": "no-cache",
-            "Accept": "text/event-stream",
-            "Accept-Encoding": "gzip",
-            "Authorization": f"Bearer {access_token}",
-        },
-    )
-
-    try:
-        async for batch in url_generator:
-            yield generate_hostname_expressions(batch)
-    except Exception as error:
-        logger.warning("Failed to retrieve ICANN list %s | %s", endpoint, error)
-        yield set()
-
+    headers = {
+        "Content-Type": "application/json",
+        "Connection": "keep-alive",
+        "Cache-Control": "no-cache",
+        "Accept": "text/event-stream",
+        "Accept-Encoding": "gzip",
+        "Authorization": f"Bearer {access_token}",
+    }
 
-async def extract_zonefile_urls(endpoint: str, headers: dict = None) -> AsyncIterator[list[str]]:
+    # Hostnames already expanded for this endpoint; zone files repeat
+    # the same owner name across many records (NS glue, multiple
+    # A/AAAA records per owner etc.). Dedup is a best-effort
+    # optimization (the database UPSERT stays correct without it), so
+    # the set stops growing past `max_seen_hostnames` to keep memory
+    # bounded for the largest TLDs, whose hundreds of millions of
+    # unique owner names would otherwise cost tens of GB of RAM here
+    seen: set[bytes] = set()
+    max_seen_hostnames = 5_000_000
+
+    # Cap on expansion tasks in flight, pipelining CPU-bound expansion
+    # on Ray workers against network + inflate on the asyncio loop
+    # without unbounded result buffering
+    max_expansions_in_flight = 4
+    max_retries: int = 5
+
+    for number_of_retries_made in range(max_retries):
+        in_flight: list = []
+        try:
+            async for batch in extract_zonefile_urls(endpoint, headers=headers):
+                # Batches arrive as memoryview slices; hostnames are only
+                # materialized to bytes if they survive deduplication
+                fresh = [bytes(url) for url in batch if url not in seen]
+                if len(seen) < max_seen_hostnames:
+                    seen.update(fresh)
+                in_flight.append(_expand_hostnames.remote([url.decode("ascii") for url in fresh]))
+                if len(in_flight) >= max_expansions_in_flight:
+                    yield await in_flight.pop(0)
+            for expansion in in_flight:
+                yield await expansion
+            return
+        except Exception as error:
+            logger.warning("Failed to retrieve ICANN list %s | %s", endpoint, error)
+            # The decompressor cannot resume a disrupted stream, so the
+            # whole pipeline is restarted from scratch; `seen` makes
+            # re-ingestion of the replayed prefix cheap. Expansions
+            # already submitted cover hostnames recorded in `seen`, so
+            # flush them first lest the replayed stream skips them
+            # for good
+            try:
+                for expansion in in_flight:
+                    yield await expansion
+            except Exception as expansion_error:
+                logger.warning("Failed to retrieve ICANN list %s | %s", endpoint, expansion_error)
+                break
+            if number_of_retries_made != max_retries - 1:  # No delay if final attempt fails
+                await backoff_delay_async(1, number_of_retries_made)
+
+    logger.error("URL: %s GET request failed!", endpoint)
+    yield set()
+
+
+async def extract_zonefile_urls(endpoint: str, headers: dict = None) -> AsyncIterator[list[memoryview]]:
     """Extract URLs from GET request stream of ICANN `txt.gz` zone file
 
     https://stackoverflow.com/a/68928891
@@ -125,37 +263,104 @@ async def extract_zonefile_urls(endpoint: str, headers: dict = None) -> AsyncIte
         aiohttp.client_exceptions.ClientError: Stream disrupted
 
     Yields:
-        AsyncIterator[list[str]]: Batch of URLs as a list
+        AsyncIterator[list[memoryview]]: Batch of lowercase ASCII URLs
+        as memoryview slices sharing each decompressed chunk's arena
     """
-    temp_file = await get_async_stream(endpoint, headers=headers)
-    if temp_file is None:
-        yield []
-    else:
-        with temp_file:
-            # Decompress and extract URLs from each chunk
-            d = zlib.decompressobj(zlib.MAX_WBITS | 32)
-            last_line: str = ""
-
-            for chunk in iter(lambda: temp_file.read(1024**2) if temp_file else lambda: b"", b""):
-                # Decompress and decode chunk to `current_chunk_string`
-                current_chunk_string = d.decompress(chunk).decode()
-                # Append `last_line` of previous chunk to
-                # front of `current_chunk_string`
-                current_chunk_string = f"{last_line}{current_chunk_string}"
-                # Split to lines
-                lines = current_chunk_string.splitlines()
-                # The last line of `lines` is likely incomplete,
-                # the rest of it is at the beginning of the next chunk,
-                # so pop it out and cache it as `last_line`
-                last_line = lines.pop()
-                # Yield list of URLs from the cleaned `lines`,
-                # ensuring that all of them are lowercase
-                yield [url for line in lines if (splitted_line := line.split()) and (url := splitted_line[0].lower().rstrip("."))]
-
-            # Yield last remaining URL from `last_line`
-            # if splitted_line has a length of at least 1
-            if (splitted_line := last_line.split()) and (url := splitted_line[0].lower().rstrip(".")):
-                yield [url]
+    # Bounded queue bridging the network producer and the
+    # inflate+parse consumer, so the next chunk is downloaded
+    # while the current one is being decompressed
+    chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=4)
+
+    async def _net_producer() -> None:
+        """Feed compressed chunks from the HTTP response stream into
+        `chunk_queue` as they arrive. A `None` sentinel signals EOF."""
+        try:
+            async for chunk in get_async_iter(endpoint, headers=headers):
+                await chunk_queue.put(chunk)
+        finally:
+            await chunk_queue.put(None)
+
+    producer_task = asyncio.create_task(_net_producer())
+
+    # Decompress and extract URLs from each chunk.
+    # No checksum pass is made over the decompressed stream
+    # beyond whatever the inflate engine itself enforces:
+    # transport integrity is already covered by TLS, and zone
+    # files are re-fetchable if a download is ever corrupted,
+    # so full-stream CRC would only add per-byte CPU cost to
+    # the hot path
+    d = zlib_engine.decompressobj(zlib_engine.MAX_WBITS | 32)
+    last_line: bytes = b""
+    loop = asyncio.get_running_loop()
+
+    # URLs accumulated across chunk boundaries, so that batch
+    # sizes are fixed instead of dictated by compression ratio
+    pending: list[memoryview] = []
+
+    try:
+        while (compressed := await chunk_queue.get()) is not None:
+            # Decompress with bounded output size; leftover
+            # compressed input is re-fed from `unconsumed_tail`
+            while compressed:
+                # Inflate releases the GIL, so running it on the
+                # default executor keeps the event loop free to
+                # drive other zone file downloads concurrently
+                current_chunk = await loop.run_in_executor(None, d.decompress, compressed, 4 << 20)
+                compressed = d.unconsumed_tail
+                if not current_chunk:
+                    continue
+                # Append `last_line` of previous chunk (already
+                # lowercase) to front of `current_chunk`, lowercased
+                # in bulk; hostnames are ASCII so the pipeline stays
+                # in `bytes` until individual URLs are emitted
+                # downstream
+                arena = last_line + current_chunk.lower()
+                # The arena likely ends mid-line; the rest of that
+                # line is at the beginning of the next chunk, so cut
+                # at the final newline and cache the remainder
+                cut = arena.rfind(b"\n") + 1
+                last_line = arena[cut:]
+                if not cut:
+                    continue
+                # Collect URLs located in a vectorized sweep over
+                # the arena as zero-copy memoryview slices, then
+                # yield them in fixed-size batches; each URL is
+                # only materialized downstream if it survives
+                # deduplication
+                arena_view = memoryview(arena)
+                starts, ends = _owner_name_spans(arena, cut)
+                for start, end in zip(starts.tolist(), ends.tolist()):
+                    # Trim trailing root-zone dot(s) by shrinking
+                    # the slice instead of copying
+                    while end > start and arena[end - 1] == 0x2E:
+                        end -= 1
+                    if end > start:
+                        pending.append(arena_view[start:end])
+                while len(pending) >= hostname_expression_batch_size:
+                    yield pending[:hostname_expression_batch_size]
+                    pending = pending[hostname_expression_batch_size:]
+
+        # Re-raise any mid-stream error captured by the producer task
+        await producer_task
+
+        # Collect last remaining URL from `last_line`
+        # if splitted_line has a length of at least 1
+        if (splitted_line := last_line.split()) and (url := splitted_line[0].rstrip(b".")):
+            pending.append(memoryview(url))
+
+        # Flush the final batch below the batch size threshold
+        if pending:
+            yield pending
+    finally:
+        # If the consumer exits abnormally (e.g. inflate error, or the
+        # caller abandoning iteration), the producer would otherwise
+        # block forever on the bounded queue with an open HTTP session
+        if not producer_task.done():
+            producer_task.cancel()
+            try:
+                await producer_task
+            except asyncio.CancelledError:
+                pass
 
 
 class ICANN:
@@ -164,24 +369,53 @@ class ICANN:
     """
 
     def __init__(self, parser_args: dict, update_time: int):
-        username = str(dotenv_values(".env").get("ICANN_ACCOUNT_USERNAME", ""))
-        password = str(dotenv_values(".env").get("ICANN_ACCOUNT_PASSWORD", ""))
+        env = dotenv_values(".env")  # Parse `.env` from disk only once
+        self.username = str(env.get("ICANN_ACCOUNT_USERNAME", ""))
+        self.password = str(env.get("ICANN_ACCOUNT_PASSWORD", ""))
 
         self.db_filenames: list[str] = []
         self.jobs: list[tuple] = []
 
         if "icann" in parser_args["sources"]:
-            access_token = asyncio.get_event_loop().run_until_complete(_authenticate(username, password))
-            endpoints: list[str] = asyncio.get_event_loop().run_until_complete(_get_approved_endpoints(access_token))
-            self.db_filenames = [f"icann_{url.rsplit('/', 1)[-1].rsplit('.')[-2]}" for url in endpoints]
-            if parser_args["fetch"]:
-                # Download and Add ICANN URLs to database
-                self.jobs = [
-                    (
-                        _get_icann_domains,
-                        update_time,
-                        db_filename,
-                        {"endpoint": endpoint, "access_token": access_token},
-                    )
-                    for db_filename, endpoint in zip(self.db_filenames, endpoints)
-                ]
+            # Sync entry point: drive the async initialisation on the
+            # thread's current event loop, creating and setting one
+            # only if the thread has none, and leave it open afterwards
+            # for the get_event_loop() call sites downstream
+            # (safebrowsing.py, process_flags.py). asyncio.run is
+            # unsuitable here: its teardown unsets the thread's event
+            # loop, making those later calls raise RuntimeError.
+            # Callers that already have an event loop running should
+            # `await init_async(...)` directly instead
+            try:
+                loop = asyncio.get_event_loop()
+            except RuntimeError:
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.init_async(parser_args, update_time))
+
+    async def init_async(self, parser_args: dict, update_time: int) -> None:
+        """Authenticate with ICANN CZDS, discover approved zone file
+        endpoints and assemble download jobs, all from within an
+        already-running event loop.
+
+        Args:
+            parser_args (dict): Flags set by user;
+            see `main.py` for more details
+            update_time (int): Time when this instance of ICANN
+            class was initialised
+        """
+        access_token, endpoints = await _bootstrap(self.username, self.password)
+        # TLD is the endpoint filename up to its first '.'
+        # (e.g. ".../com.txt.gz" -> "com")
+        self.db_filenames = [f"icann_{PurePosixPath(urlparse(url).path).name.split('.', 1)[0]}" for url in endpoints]
+        if parser_args["fetch"]:
+            # Download and Add ICANN URLs to database
+            self.jobs = [
+                (
+                    _get_icann_domains,
+                    update_time,
+                    db_filename,
+                    {"endpoint": endpoint, "access_token": access_token},
+                )
+                for db_filename, endpoint in zip(self.db_filenames, endpoints)
+            ]
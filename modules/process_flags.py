@@ -58,6 +58,9 @@ def process_flags(parser_args: dict) -> None:
 
     ipv4 = feeds.Ipv4(parser_args)
 
+    # Combined once here instead of re-concatenated at every use
+    all_db_filenames: list[str] = domains_db_filenames + ipv4.db_filenames
+
     # Create database files
     initialise_databases(mode="hashes")
     initialise_databases(domains_db_filenames, mode="domains")
@@ -122,7 +125,7 @@ def process_flags(parser_args: dict) -> None:
                         flatten(
                             execute_with_ray(
                                 retrieve_matching_full_hash_urls,
-                                [(update_time, filename, vendor) for filename in domains_db_filenames + ipv4.db_filenames],
+                                [(update_time, filename, vendor) for filename in all_db_filenames],
                             ),
                         )
                     )
@@ -137,7 +140,7 @@ def process_flags(parser_args: dict) -> None:
                     flatten(
                         execute_with_ray(
                             retrieve_matching_hash_prefix_urls,
-                            [(filename, prefix_sizes, vendor) for filename in domains_db_filenames + ipv4.db_filenames],
+                            [(filename, prefix_sizes, vendor) for filename in all_db_filenames],
                         ),
                     )
                 )
@@ -164,7 +167,7 @@ def process_flags(parser_args: dict) -> None:
                 logger.info("Updating %s malicious URL statuses in database", vendor)
                 execute_with_ray(
                     update_malicious_urls,
-                    [(update_time, vendor, filename) for filename in domains_db_filenames + ipv4.db_filenames],
+                    [(update_time, vendor, filename) for filename in all_db_filenames],
                     object_store={"malicious_urls": malicious_urls[vendor]},
                 )
 
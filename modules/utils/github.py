@@ -4,7 +4,11 @@ GitHub
 Push generated blocklists to GitHub
 """
 
+import base64
+import hashlib
+import mmap
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 from dotenv import dotenv_values
@@ -16,6 +20,52 @@ import github
 
 logger = init_logger()
 
+_env_values: Optional[dict] = None
+
+
+def _env() -> dict:
+    """Read `.env` into a module-level cache, parsing the file
+    from disk only on first call.
+
+    Returns:
+        dict: `.env` keys and values
+    """
+    global _env_values
+    if _env_values is None:
+        _env_values = dict(dotenv_values(".env"))
+    return _env_values
+
+
+_github_client: Optional[github.Github] = None
+_blocklist_repo = None
+
+
+def _blocklist_repository():
+    """Return the blocklist GitHub repository, creating and caching
+    the pygithub client and repository lookup on first call. Later
+    uploads skip the user and repository lookup round trips and reuse
+    the client's persistent connection pool.
+
+    Raises:
+        ValueError: Access Token or Blocklist Repository Name
+        missing from environment file
+
+    Returns:
+        github.Repository.Repository: Blocklist GitHub repository
+    """
+    global _github_client, _blocklist_repo
+    if _blocklist_repo is None:
+        env = _env()
+        access_token = env.get("GITHUB_ACCESS_TOKEN")
+        repo_name = env.get("BLOCKLIST_REPOSITORY_NAME")
+        if access_token is None:
+            raise ValueError("Access Token missing from environment file")
+        if repo_name is None:
+            raise ValueError("Blocklist Repository Name missing from environment file")
+        _github_client = github.Github(access_token, per_page=100, pool_size=16)
+        _blocklist_repo = _github_client.get_user().get_repo(repo_name)
+    return _blocklist_repo
+
 
 def upload_blocklists(vendor: Vendors, blocklist_filenames: tuple[str, ...], suffix: Optional[str] = None) -> None:
     """Uploads blocklists to GitHub repository
@@ -34,44 +84,67 @@ def upload_blocklists(vendor: Vendors, blocklist_filenames: tuple[str, ...], suf
             f"{vendor}_{original_filename.split('_')[1]}{f'_{suffix}' if suffix else ''}.txt" for original_filename in blocklist_filenames
         ]
 
-        access_token = dotenv_values(".env")["GITHUB_ACCESS_TOKEN"]
-        repo_name = dotenv_values(".env")["BLOCKLIST_REPOSITORY_NAME"]
-        if access_token is None:
-            raise ValueError("Access Token missing from environment file")
-        if repo_name is None:
-            raise ValueError("Blocklist Repository Name missing from environment file")
-
-        g = github.Github(access_token)
-        repo = g.get_user().get_repo(repo_name)
+        repo = _blocklist_repository()
 
         commit_message = f"Update {vendor} blocklists"
         main_ref = repo.get_git_ref("heads/main")
         main_sha = main_ref.object.sha
         base_tree = repo.get_git_tree(main_sha)
 
-        element_list = list()
-        for i, entry in enumerate(path_list):
-            with open(entry) as input_file:
-                data = input_file.read()
-            # Do not commit empty files
-            if data:
-                element = github.InputGitTreeElement(file_names[i], "100644", "blob", data)
-                element_list.append(element)
+        # Blob SHAs currently on main, fetched once so that unchanged
+        # blocklists can be detected locally before any upload
+        existing_blob_shas = {element.path: element.sha for element in repo.get_git_tree(main_sha, recursive=True).tree}
+
+        def upload_blob(entry: str, file_name: str) -> Optional[str]:
+            """Upload a single blocklist as a base64-encoded git blob,
+            unless it is empty or identical to the blob already
+            at `file_name` on main.
+
+            Args:
+                entry (str): Filepath of blocklist to be uploaded
+                file_name (str): Blocklist filename in the repository
+
+            Returns:
+                Optional[str]: SHA of uploaded git blob, or None if
+                the blocklist is empty or unchanged
+                and should not be committed
+            """
+            # Do not commit empty files; a stat call skips
+            # them without reading anything into memory
+            if not os.stat(entry).st_size:
+                return None
+            with open(entry, "rb") as input_file, mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ) as mmapped_file:
+                # git blob SHA (sha1 of b"blob <size>\\0<content>")
+                # computed locally; identical content needs
+                # neither an upload nor a commit
+                local_sha = hashlib.sha1(b"blob %d\x00" % len(mmapped_file))
+                local_sha.update(mmapped_file)
+                if existing_blob_shas.get(file_name) == local_sha.hexdigest():
+                    return None
+                return repo.create_git_blob(base64.b64encode(mmapped_file).decode("ascii"), "base64").sha
+
+        # Blob uploads are network RTT-bound, so a thread pool
+        # overlaps them; the tree then only references blob SHAs,
+        # keeping the create_git_tree request itself small
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            blob_shas = list(executor.map(upload_blob, path_list, file_names))
+
+        element_list = [
+            github.InputGitTreeElement(file_names[i], "100644", "blob", sha=blob_sha)
+            for i, blob_sha in enumerate(blob_shas)
+            if blob_sha is not None
+        ]
 
-        files_changed: list[github.File.File] = []
         if element_list:
-            # create git tree only if there are non-empty files
+            # create git tree only if there are changed non-empty
+            # files; changed blobs were identified locally, so the
+            # commit is pushed without a compare round trip
             tree = repo.create_git_tree(element_list, base_tree)
             parent = repo.get_git_commit(main_sha)
             commit = repo.create_git_commit(commit_message, tree, [parent])
-            comparison = repo.compare("main", commit.sha)
-            files_changed = comparison.files
-
-        if files_changed:
-            # Push commit to main only if there are files to change
             main_ref.edit(commit.sha)
             logger.info("Updated repository with %s blocklists", vendor)
-        elif not element_list:
+        elif not any(os.stat(entry).st_size for entry in path_list):
             logger.warning("%s blocklists are empty, won't update repository", vendor)
         else:
             logger.info("No changes found for %s blocklists", vendor)
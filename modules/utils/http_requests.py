@@ -5,6 +5,7 @@ import asyncio
 import os
 import socket
 import tempfile
+from collections.abc import AsyncIterator
 from typing import IO, Optional
 
 import aiohttp
@@ -238,3 +239,64 @@ async def get_async_stream(endpoint: str, max_retries: int = 5, headers: dict =
 
     logger.error("URL: %s GET request failed!", endpoint)
     return None
+
+
+async def get_async_iter(
+    endpoint: str,
+    chunk_size: int = 1 << 20,
+    max_retries: int = 5,
+    headers: dict = None,
+) -> AsyncIterator[bytes]:
+    """Given a HTTP endpoint, make a HTTP GET request asynchronously
+    and yield the response content in chunks as they arrive from the
+    network, without staging them in a temporary file.
+
+    The GET request is retried from scratch if it fails before the
+    first chunk has been yielded. A stream disrupted after that point
+    cannot be resumed, so its error is re-raised to the caller.
+
+    Args:
+        endpoint (str): HTTP GET request endpoint
+        chunk_size (int, optional): Maximum size of each yielded
+        chunk in bytes. Defaults to 1 MiB.
+        max_retries (int, optional): Maximum HTTP request retries.
+        Defaults to 5.
+        headers (dict, optional): HTTP Headers to
+        send with every request. Defaults to None.
+
+    Raises:
+        aiohttp.client_exceptions.ClientError: Stream disrupted
+        after first chunk was yielded
+
+    Yields:
+        AsyncIterator[bytes]: HTTP response content chunks. Ends
+        without yielding anything if the GET request fails to start
+        after `max_retries`
+    """
+    if headers is None:
+        headers = default_headers
+
+    for number_of_retries_made in range(max_retries):
+        # GET request timeout of 3 hours (10800 seconds);
+        # extended from API default of 5 minutes to handle large filesizes
+        async with aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=0, ttl_dns_cache=300),
+            raise_for_status=True,
+            timeout=aiohttp.ClientTimeout(total=10800),
+            request_class=KeepAliveClientRequest,
+        ) as session:
+            stream_started = False
+            try:
+                async with session.get(endpoint, headers=headers) as response:
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        stream_started = True
+                        yield chunk
+                return
+            except Exception as error:
+                if stream_started:
+                    raise
+                logger.warning("URL: %s | %s", endpoint, error)
+                if number_of_retries_made != max_retries - 1:  # No delay if final attempt fails
+                    await backoff_delay_async(1, number_of_retries_made)
+
+    logger.error("URL: %s GET request failed!", endpoint)